@@ -2,25 +2,42 @@
 Charlottesville Building Permits - Downtown Mall 数据清洗
 ========================================================
 用法: python3 clean_permits.py building_permits_all.csv
+依赖: pip3 install pandas  (可选: pyahocorasick)
 """
 
-import csv
+import codecs
+import re
 import sys
-from collections import Counter
 from datetime import datetime
 
+import pandas as pd
+
+# 可选: pyahocorasick（C 扩展的多关键词匹配），没装时退回正则
+try:
+    import ahocorasick
+
+    HAS_AHOCORASICK = True
+except ImportError:
+    HAS_AHOCORASICK = False
+
 if len(sys.argv) < 2:
     print("用法: python3 clean_permits.py building_permits_all.csv")
     sys.exit(1)
 
 filepath = sys.argv[1]
 
-# 读取数据
-with open(filepath, "r", encoding="utf-8") as f:
-    reader = csv.DictReader(f)
-    records = list(reader)
+# 读取数据（C 解析器，全部按字符串读入，空值保留为 ""）
+# 注: 约 4.7 万行的文件解析只要 ~0.1s，脚本耗时主要在 import pandas。
+# 换 DuckDB 整体算下来反而更慢；engine="pyarrow" 会先推断类型，
+# 把 Fee 这类列读成 "100.0"，改变导出的 CSV，所以保留默认引擎。
+df = pd.read_csv(filepath, dtype=str, keep_default_na=False, encoding="utf-8")
+# pandas 会去掉表头前的 BOM；记下源文件有没有，导出时原样保留
+with open(filepath, "rb") as f:
+    SOURCE_ENCODING = "utf-8-sig" if f.read(3) == codecs.BOM_UTF8 else "utf-8"
+# 低基数的列转成 category: 每个不同的值只存一份，计数直接在整数编码上做
+df = df.astype({"PermitType": "category", "PropertyAddress": "category"})
 
-print(f"📂 Total records: {len(records)}")
+print(f"📂 Total records: {len(df)}")
 
 # ============================================================
 # 过滤 Downtown Mall 区域
@@ -39,107 +56,98 @@ DOWNTOWN_KEYWORDS = [
     "5TH ST",
     "OLD PRESTON",
 ]
-
-downtown = []
-for rec in records:
-    addr = rec.get("PropertyAddress", "").upper()
-    if any(kw in addr for kw in DOWNTOWN_KEYWORDS):
-        downtown.append(rec)
+# 所有关键词合并成一个正则，每个地址只扫描一遍
+DOWNTOWN_PATTERN = re.compile("|".join(map(re.escape, DOWNTOWN_KEYWORDS)))
+
+if HAS_AHOCORASICK:
+    DOWNTOWN_AUTOMATON = ahocorasick.Automaton()
+    for kw in DOWNTOWN_KEYWORDS:
+        DOWNTOWN_AUTOMATON.add_word(kw, kw)
+    DOWNTOWN_AUTOMATON.make_automaton()
+
+# 同一地址会出现很多次，每个不同的地址（category 的类别）只转大写、只匹配一遍
+unique_addrs = pd.Series(df["PropertyAddress"].cat.categories)
+unique_upper = unique_addrs.str.upper()
+if HAS_AHOCORASICK:
+    matched = unique_upper.map(lambda a: next(DOWNTOWN_AUTOMATON.iter(a), None) is not None)
+else:
+    matched = unique_upper.str.contains(DOWNTOWN_PATTERN)
+is_downtown = df["PropertyAddress"].isin(unique_addrs[matched])
+downtown = df[is_downtown]
 
 print(f"🏬 Downtown Mall area: {len(downtown)} records")
 
 # ============================================================
 # 按年统计
 # ============================================================
-def get_year(rec):
-    """从 AppliedDate 或 IssuedDate 提取年份"""
-    for field in ["IssuedDate", "AppliedDate"]:
-        val = rec.get(field, "")
-        if val and val.strip():
-            try:
-                return int(val[:4])
-            except:
-                pass
-    return None
-
-# 全市按年
-year_all = Counter()
-for rec in records:
-    y = get_year(rec)
-    if y:
-        year_all[y] += 1
-
-# Downtown 按年
-year_dt = Counter()
-for rec in downtown:
-    y = get_year(rec)
-    if y:
-        year_dt[y] += 1
+def to_year(dates):
+    """日期字符串以 4 位数字开头时取作年份，否则记为 NA（如 "5.12.2019"、" 201"）"""
+    return pd.to_numeric(dates.str.extract(r"^(\d{4})", expand=False), errors="coerce")
+
+# IssuedDate 优先，缺失或无效时用 AppliedDate；年份 0 不计入统计
+year = to_year(df["IssuedDate"]).fillna(to_year(df["AppliedDate"])).astype("Int64")
+year = year.where(year != 0)
+
+# 一次 groupby 同时按 (年份, 是否 Downtown) 计数，不再分别扫两遍
+counts = year.groupby([year, is_downtown]).size().unstack(fill_value=0)
+counts = counts.reindex(columns=[False, True], fill_value=0)
+by_year = pd.DataFrame({
+    "all_city": counts.sum(axis=1),   # 全市按年
+    "downtown_mall": counts[True],    # Downtown 按年
+})
+by_year.index.name = "year"
 
 # ============================================================
 # 输出 CSV
 # ============================================================
 
+# 导出格式与 csv 模块一致（CRLF 换行），已提交的 CSV 不会因换行符变化而整文件改动
 # 1. Downtown permits 完整数据
-fieldnames = records[0].keys()
-with open("permits_downtown_mall.csv", "w", newline="", encoding="utf-8") as f:
-    writer = csv.DictWriter(f, fieldnames=fieldnames)
-    writer.writeheader()
-    writer.writerows(downtown)
+downtown.to_csv("permits_downtown_mall.csv", index=False, encoding=SOURCE_ENCODING, lineterminator="\r\n")
 print(f"💾 Saved: permits_downtown_mall.csv")
 
 # 2. 按年统计
-years = sorted(set(list(year_all.keys()) + list(year_dt.keys())))
-with open("permits_by_year.csv", "w", newline="", encoding="utf-8") as f:
-    writer = csv.writer(f)
-    writer.writerow(["year", "all_city", "downtown_mall"])
-    for y in years:
-        writer.writerow([y, year_all.get(y, 0), year_dt.get(y, 0)])
+by_year.to_csv("permits_by_year.csv", encoding="utf-8", lineterminator="\r\n")
 print(f"💾 Saved: permits_by_year.csv")
 
 # ============================================================
 # 终端可视化
 # ============================================================
-max_val = max(year_all.values()) if year_all else 1
+max_val = by_year["all_city"].max() if len(by_year) else 1
 BAR_WIDTH = 50  # 最大柱宽
 
-print(f"\n{'='*70}")
-print(f"📊 全市 Building Permits (按年)")
-print(f"{'='*70}")
-for y in years:
-    n = year_all.get(y, 0)
-    bar_len = int(n / max_val * BAR_WIDTH)
-    bar = "█" * bar_len
-    print(f"  {y} │ {bar} {n}")
-
-if year_dt:
-    max_dt = max(year_dt.values())
-    print(f"\n{'='*70}")
-    print(f"📊 Downtown Mall 区域 Permits (按年)")
-    print(f"{'='*70}")
-    for y in years:
-        n = year_dt.get(y, 0)
-        bar_len = int(n / max_dt * BAR_WIDTH) if max_dt > 0 else 0
-        bar = "█" * bar_len
-        print(f"  {y} │ {bar} {n}")
+
+def print_block(title, lines):
+    """标题和所有行拼成一个字符串，一次写入 stdout"""
+    sys.stdout.write(f"\n{'='*70}\n{title}\n{'='*70}\n" + "".join(f"{line}\n" for line in lines))
+
+
+print_block("📊 全市 Building Permits (按年)", (
+    f"  {y} │ {'█' * int(n / max_val * BAR_WIDTH)} {n}"
+    for y, n in by_year["all_city"].items()
+))
+
+if by_year["downtown_mall"].any():
+    max_dt = by_year["downtown_mall"].max()
+    print_block("📊 Downtown Mall 区域 Permits (按年)", (
+        f"  {y} │ {'█' * int(n / max_dt * BAR_WIDTH)} {n}"
+        for y, n in by_year["downtown_mall"].items()
+    ))
 
 # ============================================================
 # Downtown Permit 类型分布
 # ============================================================
-if downtown:
-    type_counts = Counter(rec.get("PermitType", "Unknown") for rec in downtown)
-    print(f"\n{'='*70}")
-    print(f"📊 Downtown Mall - Permit 类型分布")
-    print(f"{'='*70}")
-    for ptype, count in type_counts.most_common(10):
-        print(f"  {ptype:30s} {count}")
+if len(downtown):
+    # downtown 仍带着全市的类别，先去掉没用到的，否则 value_counts 会补出计数为 0 的项
+    type_counts = downtown["PermitType"].cat.remove_unused_categories().value_counts().head(10)
+    print_block("📊 Downtown Mall - Permit 类型分布", (
+        f"  {ptype:30s} {count}" for ptype, count in type_counts.items()
+    ))
 
     # 地址分布 Top 15
-    addr_counts = Counter(rec.get("PropertyAddress", "Unknown") for rec in downtown)
-    print(f"\n{'='*70}")
-    print(f"📊 Downtown Mall - 热门地址 Top 15")
-    print(f"{'='*70}")
-    for addr, count in addr_counts.most_common(15):
-        print(f"  {addr:40s} {count}")
+    addr_counts = downtown["PropertyAddress"].cat.remove_unused_categories().value_counts().head(15)
+    print_block("📊 Downtown Mall - 热门地址 Top 15", (
+        f"  {addr:40s} {count}" for addr, count in addr_counts.items()
+    ))
 
 print(f"\n✅ Done!")
\ No newline at end of file
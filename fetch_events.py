@@ -29,7 +29,10 @@ Usage:
 
 import json
 import csv
-from datetime import date, timedelta
+import heapq
+from collections import Counter
+from datetime import date
+from functools import lru_cache
 import sys
 
 # Try to import scraping libraries (optional)
@@ -310,6 +313,24 @@ def scrape_visit_cville():
 # ============================================================
 # GENERATE CONCRETE EVENT DATES
 # ============================================================
+@lru_cache(maxsize=None)
+def _weekly(year, start_month, start_day, end_month, end_day, weekday):
+    """All dates falling on `weekday` within a season window (cached per year)."""
+    start = date(year, start_month, start_day).toordinal()
+    end = date(year, end_month, end_day).toordinal()
+    # date.weekday() == (ordinal - 1) % 7, so the first match is a fixed offset from start
+    first = start + (weekday - (start - 1)) % 7
+    return tuple(date.fromordinal(o) for o in range(first, end + 1, 7))
+
+
+@lru_cache(maxsize=None)
+def _first_fridays(year):
+    """First Friday of each month of `year` (cached per year)."""
+    firsts = (date(year, month, 1).toordinal() for month in range(1, 13))
+    # First Friday is at most 6 days after the 1st
+    return tuple(date.fromordinal(o + (4 - (o - 1)) % 7) for o in firsts)
+
+
 def generate_event_dates(event_def, year):
     """Generate specific dates for an event in a given year."""
     if year < event_def.get('start_year', 2015):
@@ -332,55 +353,57 @@ def generate_event_dates(event_def, year):
                 pass
 
     elif pattern == 'every_friday':
-        start = date(year, event_def['season_start_month'], event_def['season_start_day'])
-        end = date(year, event_def['season_end_month'], event_def['season_end_day'])
-        d = start
-        while d <= end:
-            if d.weekday() == 4:  # Friday
-                dates.append(d)
-            d += timedelta(days=1)
+        dates.extend(_weekly(year, event_def['season_start_month'], event_def['season_start_day'],
+                             event_def['season_end_month'], event_def['season_end_day'], 4))  # Friday
 
     elif pattern == 'every_saturday':
-        start = date(year, event_def['season_start_month'], event_def['season_start_day'])
-        end = date(year, event_def['season_end_month'], event_def['season_end_day'])
-        d = start
-        while d <= end:
-            if d.weekday() == 5:  # Saturday
-                dates.append(d)
-            d += timedelta(days=1)
+        dates.extend(_weekly(year, event_def['season_start_month'], event_def['season_start_day'],
+                             event_def['season_end_month'], event_def['season_end_day'], 5))  # Saturday
 
     elif pattern == 'first_friday':
-        for month in range(1, 13):
-            d = date(year, month, 1)
-            # Find first Friday
-            while d.weekday() != 4:
-                d += timedelta(days=1)
-            dates.append(d)
+        dates.extend(_first_fridays(year))
 
     return dates
 
 
+CALENDAR_FIELDS = ['date', 'name', 'type', 'boost', 'description', 'location', 'source']
+
+
 def build_full_calendar(start_year=2015, end_year=2025):
-    """Build complete event calendar with specific dates."""
-    calendar = []
-
-    for event_def in RECURRING_EVENTS:
-        for year in range(start_year, end_year + 1):
-            dates = generate_event_dates(event_def, year)
-            for d in dates:
-                calendar.append({
-                    'date': d.isoformat(),
-                    'name': event_def['name'],
-                    'type': event_def['type'],
-                    'boost': event_def['boost'],
-                    'description': event_def.get('description', ''),
-                    'location': event_def.get('location', 'Downtown Mall'),
-                    'source': event_def.get('source', 'curated'),
-                })
-
-    # Sort by date
-    calendar.sort(key=lambda x: x['date'])
-    return calendar
+    """Build complete event calendar with specific dates.
+
+    Returns a dict of parallel columns (one list per field in
+    CALENDAR_FIELDS) sorted by date.
+    """
+    event_fields = []  # per-event values for CALENDAR_FIELDS[1:]
+    streams = []  # one date-ordered stream of (date, event index) per event
+    for i, event_def in enumerate(RECURRING_EVENTS):
+        # Per-event fields are the same for every date, look them up once
+        name, typ, boost = event_def['name'], event_def['type'], event_def['boost']
+        desc = event_def.get('description', '')
+        loc = event_def.get('location', 'Downtown Mall')
+        src = event_def.get('source', 'curated')
+        event_fields.append((name, typ, boost, desc, loc, src))
+        # Sort each (short) stream rather than trusting typical_days to be
+        # listed in order; merge() would silently emit an unsorted calendar.
+        streams.append(sorted(
+            (d.isoformat(), i)
+            for year in range(start_year, end_year + 1)
+            for d in generate_event_dates(event_def, year)
+        ))
+
+    # Merge the sorted per-event streams instead of sorting the whole
+    # calendar; ties on a date keep definition order via the event index.
+    merged = list(heapq.merge(*streams))
+    columns = {'date': [d for d, _ in merged]}
+    for k, field in enumerate(CALENDAR_FIELDS[1:]):
+        columns[field] = [event_fields[i][k] for _, i in merged]
+    return columns
+
+
+def calendar_rows(calendar):
+    """Iterate a columnar calendar as row tuples in CALENDAR_FIELDS order."""
+    return zip(*(calendar[field] for field in CALENDAR_FIELDS))
 
 
 def build_viz_format():
@@ -438,26 +461,23 @@ if __name__ == '__main__':
     # Build full calendar
     print("\n[2/4] Generating event calendar (2015-2025)...")
     calendar = build_full_calendar()
-    print(f"  Generated {len(calendar)} total event-days")
+    total_days = len(calendar['date'])
+    print(f"  Generated {total_days} total event-days")
 
     # Count by type
-    by_type = {}
-    for ev in calendar:
-        by_type[ev['type']] = by_type.get(ev['type'], 0) + 1
+    by_type = Counter(calendar['type'])
     for t, c in sorted(by_type.items()):
         print(f"    {t}: {c} days")
 
     # Count by year
-    by_year = {}
-    for ev in calendar:
-        yr = ev['date'][:4]
-        by_year[yr] = by_year.get(yr, 0) + 1
+    by_year = Counter(d[:4] for d in calendar['date'])
     print("\n  Events by year:")
     for yr in sorted(by_year.keys()):
         print(f"    {yr}: {by_year[yr]} event-days")
 
     # Save full calendar as JSON
     print("\n[3/4] Saving outputs...")
+    viz = build_viz_format()
     with open('cville_events_calendar.json', 'w') as f:
         json.dump({
             'metadata': {
@@ -465,30 +485,29 @@ if __name__ == '__main__':
                 'source': 'Curated from local news, official event pages, and web scraping',
                 'years': '2015-2025',
                 'event_definitions': len(RECURRING_EVENTS),
-                'total_event_days': len(calendar),
+                'total_event_days': total_days,
                 'scraped_ting': len(ting_events),
                 'scraped_visit_cville': len(visit_events),
             },
             'event_definitions': RECURRING_EVENTS,
-            'calendar': calendar,
-            'viz_format': build_viz_format(),
+            'calendar': [dict(zip(CALENDAR_FIELDS, row)) for row in calendar_rows(calendar)],
+            'viz_format': viz,
         }, f, indent=2, default=str)
     print("  -> cville_events_calendar.json")
 
     # Save as CSV
     with open('cville_events_calendar.csv', 'w', newline='') as f:
-        writer = csv.DictWriter(f, fieldnames=['date', 'name', 'type', 'boost', 'description', 'location', 'source'])
-        writer.writeheader()
-        writer.writerows(calendar)
+        writer = csv.writer(f)
+        writer.writerow(CALENDAR_FIELDS)
+        writer.writerows(calendar_rows(calendar))
     print("  -> cville_events_calendar.csv")
 
     # Also save the viz-format JSON (for direct embedding in HTML)
-    viz = build_viz_format()
     with open('cville_events_viz.json', 'w') as f:
         json.dump(viz, f, indent=2)
     print("  -> cville_events_viz.json (visualization format)")
 
-    print(f"\n[4/4] Done! {len(RECURRING_EVENTS)} event types, {len(calendar)} total event-days")
+    print(f"\n[4/4] Done! {len(RECURRING_EVENTS)} event types, {total_days} total event-days")
     print("\nKey events in the data:")
     for ev in RECURRING_EVENTS:
         skip = f" (skip: {ev.get('skip_years', [])})" if ev.get('skip_years') else ""
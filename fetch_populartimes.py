@@ -5,21 +5,38 @@ Downtown Mall Popular Times 数据获取（v3 - 已验证地点）
 
 安装:
   pip3 install --upgrade git+https://github.com/GrocerCheck/LivePopularTimes
+  pip3 install orjson   # 可选，JSON 写出更快
 
 运行:
   python3 fetch_populartimes.py
+  python3 fetch_populartimes.py --force-refresh   # 忽略本地缓存，全部重新抓取
 """
 
+import argparse
+import io
 import json
 import time
 import csv
 import sys
 import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+from operator import itemgetter
 from dotenv import load_dotenv
 
+parser = argparse.ArgumentParser(description="Fetch Popular Times for Downtown Mall places")
+parser.add_argument("--force-refresh", action="store_true", help="忽略 .cache/ 中的缓存，重新抓取所有地点")
+args = parser.parse_args()
+
 load_dotenv()  # 加载 .env 文件中的变量
 API_KEY = os.getenv("GOOGLE_API_KEY") # 从系统环境读取
 
+# 可选: orjson 序列化更快，没装时用标准库 json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 try:
     import livepopulartimes
 except ImportError:
@@ -47,58 +64,170 @@ PLACES = [
     {"name": "Miller's Downtown", "place_id": "ChIJ13muzCWGs4kRsN2z4eq3h58", "address": "109 W Main St, Charlottesville, VA 22902"},
 ]
 
-results = {}
-success_count = 0
+FETCH_WORKERS = 4  # 同时抓取的地点数（也是同时在途请求数的上限）
+ZERO_DAY = (0,) * 24  # 缺少 data 时的默认一天（不可变，所有地方共用一份）
+MAX_ATTEMPTS = 3  # 网络错误时最多尝试 3 次
+
+
+def with_retries(fn, *args):
+    """不做固定等待，只在网络错误时指数退避重试（1s, 2s, ... 最多 30s）"""
+    for attempt in range(MAX_ATTEMPTS):
+        try:
+            return fn(*args)
+        except OSError:  # 包括 urllib / requests 的连接、超时错误
+            if attempt == MAX_ATTEMPTS - 1:
+                raise
+            time.sleep(min(2 ** attempt, 30))
+
+
+# 本地缓存: 每个地点一个 JSON 文件（按 place_id 命名）
+# Popular Times 的每周直方图变化很慢，缓存一周内有效
+CACHE_DIR = os.path.join(".cache", "populartimes")
+CACHE_TTL = 7 * 24 * 3600
+# 实时字段只在抓取那一刻有意义，不写入缓存，也不从缓存返回
+LIVE_FIELDS = ("current_popularity",)
+
+
+def strip_live(data):
+    """去掉实时字段后的副本"""
+    return {k: v for k, v in data.items() if k not in LIVE_FIELDS}
+
+
+def load_cache(place_id):
+    """读取未过期的缓存，没有、已过期或 --force-refresh 时返回 None"""
+    if args.force_refresh:
+        return None
+    path = os.path.join(CACHE_DIR, f"{place_id}.json")
+    try:
+        if time.time() - os.path.getmtime(path) < CACHE_TTL:
+            with open(path, "r", encoding="utf-8") as f:
+                return strip_live(json.load(f))
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def save_cache(place_id, data):
+    """先写临时文件再原子替换，中途崩溃不会留下半个 JSON"""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = os.path.join(CACHE_DIR, f"{place_id}.json")
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(strip_live(data), f, ensure_ascii=False)
+    os.replace(path + ".tmp", path)
+
+
+def try_save_cache(place_id, data, log):
+    """缓存只是优化: 写入失败只记一条警告，不影响已抓到的数据"""
+    try:
+        save_cache(place_id, data)
+    except OSError as e:
+        log.append(f"   ⚠️  Cache write failed: {str(e)[:80]}")
+
+
+# 同一次运行内缓存抓取结果。注意 lru_cache 不会挡住并发的同名请求，
+# 重复的 place_id 在提交线程池前就已去重；这里只省掉先后发生的重复查询
+# （例如不同地点回退到同一个地址）
+@lru_cache(maxsize=128)
+def fetch_by_place_id(place_id):
+    return with_retries(livepopulartimes.get_populartimes_by_PlaceID, API_KEY, place_id)
 
-print("🔍 Fetching Popular Times for Downtown Mall locations...")
-print("=" * 60)
 
-for i, place in enumerate(PLACES):
-    name = place["name"]
-    print(f"\n[{i+1}/{len(PLACES)}] 📍 {name}")
+@lru_cache(maxsize=128)
+def fetch_by_address(address):
+    return with_retries(livepopulartimes.get_populartimes_by_address, address)
+
+
+def find_peak(pt):
+    """一周中最繁忙的时刻 (星期, 小时, 数值)；没有正值时返回 ("", 0, 0)"""
+    peak_day, peak_hour, peak_val = "", 0, 0
+    for day in pt:
+        day_data = day.get("data")
+        if not day_data:
+            continue
+        hour, val = max(enumerate(day_data), key=itemgetter(1))
+        if val > peak_val:  # 并列时保留更早的一天
+            peak_day, peak_hour, peak_val = day["name"], hour, val
+    return peak_day, peak_hour, peak_val
+
+
+def fetch_one(place):
+    """抓取单个地点: 先用 Place ID, 失败再用地址。返回 (data, 日志行)"""
+    log = []
+
+    data = load_cache(place["place_id"])
+    if data is not None:
+        max_day, max_hour, max_val = find_peak(data["populartimes"])
+        log.append(f"   💨 cached! Peak: {max_day} {max_hour}:00 ({max_val}/100)")
+        return data, log
 
     # 方法 1: Place ID
-    got_data = False
     try:
-        data = livepopulartimes.get_populartimes_by_PlaceID(API_KEY, place["place_id"])
+        data = fetch_by_place_id(place["place_id"])
         if data.get("populartimes"):
-            results[name] = data
-            got_data = True
-            success_count += 1
-            max_val, max_day, max_hour = 0, "", 0
-            for day in data["populartimes"]:
-                for h, val in enumerate(day.get("data", [])):
-                    if val > max_val:
-                        max_val, max_day, max_hour = val, day["name"], h
-            print(f"   ✅ PlaceID method worked! Peak: {max_day} {max_hour}:00 ({max_val}/100)")
+            max_day, max_hour, max_val = find_peak(data["populartimes"])
+            log.append(f"   ✅ PlaceID method worked! Peak: {max_day} {max_hour}:00 ({max_val}/100)")
+        else:
+            data = None
     except Exception as e:
-        print(f"   ⚠️  PlaceID method failed: {str(e)[:80]}")
-
-    if got_data:
-        time.sleep(2)
-        continue
+        log.append(f"   ⚠️  PlaceID method failed: {str(e)[:80]}")
+        data = None
+    # 写缓存放在 try 之外: 缓存写失败不能当成抓取失败
+    if data is not None:
+        try_save_cache(place["place_id"], data, log)
+        return data, log
 
     # 方法 2: Address
     try:
-        data = livepopulartimes.get_populartimes_by_address(place["address"])
+        data = fetch_by_address(place["address"])
         if data.get("populartimes"):
-            results[name] = data
-            got_data = True
-            success_count += 1
-            max_val, max_day, max_hour = 0, "", 0
-            for day in data["populartimes"]:
-                for h, val in enumerate(day.get("data", [])):
-                    if val > max_val:
-                        max_val, max_day, max_hour = val, day["name"], h
-            print(f"   ✅ Address method worked! Peak: {max_day} {max_hour}:00 ({max_val}/100)")
+            max_day, max_hour, max_val = find_peak(data["populartimes"])
+            log.append(f"   ✅ Address method worked! Peak: {max_day} {max_hour}:00 ({max_val}/100)")
         else:
-            print(f"   ❌ No popular times returned")
-            results[name] = {"status": "no_data", "raw": data}
+            log.append(f"   ❌ No popular times returned")
+            return {"status": "no_data", "raw": data}, log
     except Exception as e:
-        print(f"   ❌ Address method failed: {str(e)[:80]}")
-        results[name] = {"status": "error", "error": str(e)}
+        log.append(f"   ❌ Address method failed: {str(e)[:80]}")
+        return {"status": "error", "error": str(e)}, log
+
+    try_save_cache(place["place_id"], data, log)
+    return data, log
 
-    time.sleep(3)
+
+def ndjson_line(obj):
+    """序列化成一行 NDJSON（bytes）"""
+    if orjson:
+        return orjson.dumps(obj) + b"\n"
+    return json.dumps(obj, ensure_ascii=False).encode("utf-8") + b"\n"
+
+
+print("🔍 Fetching Popular Times for Downtown Mall locations...")
+print("=" * 60)
+
+# 网络请求是 I/O 密集型，用线程池并发抓取；日志在主线程按完成顺序打印
+# 每个地点一完成就追加一行到 NDJSON，中途崩溃也不会丢掉已抓到的数据
+fetched = {}
+with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as executor, \
+        open("populartimes_data.ndjson", "wb") as ndjson:
+    # 相同 place_id 的地点只提交一次，结果分给所有同 ID 的地点
+    by_place_id = {}
+    for place in PLACES:
+        by_place_id.setdefault(place["place_id"], []).append(place)
+    futures = {executor.submit(fetch_one, same[0]): same for same in by_place_id.values()}
+    done = 0
+    for future in as_completed(futures):
+        data, log = future.result()
+        for name in (place["name"] for place in futures[future]):
+            done += 1
+            fetched[name] = data
+            ndjson.write(ndjson_line({"place": name, "data": data}))
+            ndjson.flush()
+            print(f"\n[{done}/{len(PLACES)}] 📍 {name}")
+            for line in log:
+                print(line)
+
+# 结果按 PLACES 原顺序保存
+results = {place["name"]: fetched[place["name"]] for place in PLACES}
+success_count = sum(1 for data in results.values() if data.get("populartimes"))
 
 # ============================================================
 # 保存结果
@@ -106,55 +235,65 @@ for i, place in enumerate(PLACES):
 print("\n" + "=" * 60)
 print(f"📊 Results: {success_count}/{len(PLACES)} places returned data\n")
 
-# 1. JSON
-with open("populartimes_data.json", "w", encoding="utf-8") as f:
-    json.dump(results, f, indent=2, ensure_ascii=False)
+# 1. JSON（有 orjson 时用它序列化，输出格式相同）
+if orjson:
+    with open("populartimes_data.json", "wb") as f:
+        f.write(orjson.dumps(results, option=orjson.OPT_INDENT_2))
+else:
+    with open("populartimes_data.json", "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
 print("💾 populartimes_data.json")
+print("💾 populartimes_data.ndjson (抓取过程中逐个地点写入)")
 
 # 2. CSV 矩阵
-with open("populartimes_matrix.csv", "w", newline="", encoding="utf-8") as f:
+with open("populartimes_matrix.csv", "w", newline="", encoding="utf-8", buffering=1 << 20) as f:
     writer = csv.writer(f)
     writer.writerow(["place", "day"] + [f"{h}:00" for h in range(24)])
-    for name, data in results.items():
-        pt = data.get("populartimes")
-        if not pt:
-            continue
-        for day in pt:
-            writer.writerow([name, day["name"]] + day.get("data", [0]*24))
+    writer.writerows(
+        (name, day["name"], *day.get("data", ZERO_DAY))
+        for name, data in results.items()
+        if data.get("populartimes")
+        for day in data["populartimes"]
+    )
 print("💾 populartimes_matrix.csv")
 
-# 3. 打印成功地点的摘要
-print("\n" + "=" * 60)
-print("📋 SUMMARY")
-print("=" * 60)
+# 3. 打印成功地点的摘要（先写进缓冲区，最后一次性输出）
+buf = io.StringIO()
+buf.write("\n" + "=" * 60 + "\n")
+buf.write("📋 SUMMARY\n")
+buf.write("=" * 60 + "\n")
 
 DAY_NAMES = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
 BAR_WIDTH = 30
+# 柱子只有 BAR_WIDTH + 1 种长度，预先生成好
+BARS = tuple("█" * i + "░" * (BAR_WIDTH - i) for i in range(BAR_WIDTH + 1))
 
 for name, data in results.items():
     pt = data.get("populartimes")
     if not pt:
-        print(f"\n  ❌ {name}: No data")
+        buf.write(f"\n  ❌ {name}: No data\n")
         continue
 
-    print(f"\n  📍 {name}")
+    buf.write(f"\n  📍 {name}\n")
     current = data.get("current_popularity")
     if current:
-        print(f"     🔴 Live now: {current}/100")
+        buf.write(f"     🔴 Live now: {current}/100\n")
     time_spent = data.get("time_spent")
     if time_spent:
-        print(f"     ⏱️  Avg visit: {time_spent[0]}-{time_spent[1]} min")
+        buf.write(f"     ⏱️  Avg visit: {time_spent[0]}-{time_spent[1]} min\n")
 
     # 每天的峰值
     for day in pt:
-        day_data = day.get("data", [])
-        if not day_data or max(day_data) == 0:
-            print(f"     {day['name']:9s} │ (closed)")
+        day_name = day["name"]
+        # 一次遍历同时得到峰值和所在小时（并列时取最早的小时）
+        peak_hour, peak_val = max(enumerate(day.get("data") or ZERO_DAY), key=itemgetter(1))
+        if peak_val == 0:
+            buf.write(f"     {day_name:9s} │ (closed)\n")
             continue
-        peak_hour = day_data.index(max(day_data))
-        peak_val = max(day_data)
         bar_len = int(peak_val / 100 * BAR_WIDTH)
-        bar = "█" * bar_len + "░" * (BAR_WIDTH - bar_len)
-        print(f"     {day['name']:9s} │ {bar} peak {peak_val} @ {peak_hour}:00")
+        bar = BARS[max(0, min(bar_len, BAR_WIDTH))]
+        buf.write(f"     {day_name:9s} │ {bar} peak {peak_val} @ {peak_hour}:00\n")
+
+sys.stdout.write(buf.getvalue())
 
 print(f"\n✅ Done! Check populartimes_data.json and populartimes_matrix.csv")
\ No newline at end of file
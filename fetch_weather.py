@@ -3,59 +3,151 @@ Charlottesville 2025 历史天气数据获取脚本
 ==========================================
 使用 Open-Meteo Historical Weather API（免费，无需 API Key）
 
+安装:
+  pip3 install requests numpy pandas
+  pip3 install orjson   # 可选，JSON 解析更快
+
 使用方法:
   python3 fetch_weather.py
+  python3 fetch_weather.py --force-refresh   # 忽略本地缓存，重新下载
 
 输出:
   - charlottesville_weather_2025.csv
 """
 
-import urllib.request
+import argparse
+import hashlib
+import os
+import time
 import json
-import csv
 import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+except ImportError:
+    print("❌ 请先安装 requests:")
+    print("   pip3 install requests")
+    sys.exit(1)
+
+# 可选: orjson 解析大数组更快，没装时用标准库 json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+parser = argparse.ArgumentParser(description="Fetch Charlottesville daily weather from Open-Meteo")
+parser.add_argument("--force-refresh", action="store_true", help="忽略 .cache/ 中的缓存，重新下载")
+args = parser.parse_args()
 
 # Charlottesville 经纬度
 LAT = 38.0293
 LON = -78.4767
+START_DATE = "2015-01-01"
+END_DATE = "2025-12-31"
+
+# 复用连接（keep-alive）的会话，多次请求时省掉重复的 TCP/TLS 握手
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=10))
 
 # 构造 API URL
 # 注意：Open-Meteo 的 archive API 数据有约 5 天延迟
 # 2025 年数据如果还没完整到 12/31，会自动返回到可用日期
-API_URL = (
-    f"https://archive-api.open-meteo.com/v1/archive"
-    f"?latitude={LAT}&longitude={LON}"
-    f"&start_date=2015-01-01&end_date=2025-12-31"
-    f"&daily=temperature_2m_max,temperature_2m_min,temperature_2m_mean,"
-    f"precipitation_sum,weather_code"
-    f"&timezone=America/New_York"
-    f"&temperature_unit=fahrenheit"
-    f"&precipitation_unit=inch"
-)
+def archive_url(start_date, end_date):
+    return (
+        f"https://archive-api.open-meteo.com/v1/archive"
+        f"?latitude={LAT}&longitude={LON}"
+        f"&start_date={start_date}&end_date={end_date}"
+        f"&daily=temperature_2m_max,temperature_2m_min,temperature_2m_mean,"
+        f"precipitation_sum,weather_code"
+        f"&timezone=America/New_York"
+        f"&temperature_unit=fahrenheit"
+        f"&precipitation_unit=inch"
+    )
+
+
+# 整段日期按年拆成多个请求并发下载（首尾两年按 START_DATE / END_DATE 截断）
+FETCH_WORKERS = 4
+CHUNKS = [
+    (max(f"{year}-01-01", START_DATE), min(f"{year}-12-31", END_DATE))
+    for year in range(int(START_DATE[:4]), int(END_DATE[:4]) + 1)
+]
+
+
+def fetch_chunk(chunk):
+    """下载一段日期的数据，返回解析后的 JSON"""
+    response = SESSION.get(archive_url(*chunk), timeout=30)
+    response.raise_for_status()
+    # requests 默认带 Accept-Encoding: gzip，响应体压缩传输
+    return orjson.loads(response.content) if orjson else response.json()
+
 
 print(f"🌤️  Fetching Charlottesville 2025 weather data from Open-Meteo...")
-print(f"   URL: {API_URL}\n")
+print(f"   Range: {START_DATE} → {END_DATE}\n")
 
-try:
-    req = urllib.request.Request(API_URL)
-    with urllib.request.urlopen(req) as response:
-        data = json.loads(response.read().decode())
-except Exception as e:
-    print(f"❌ Error fetching data: {e}")
-    sys.exit(1)
+# 本地缓存: 按 (经纬度, 日期范围) 的 SHA1 命名，24 小时内有效
+# （最近几天的数据会陆续补齐，所以不永久缓存）
+CACHE_DIR = os.path.join(".cache", "weather")
+CACHE_TTL = 24 * 3600
+cache_key = hashlib.sha1(f"{LAT},{LON},{START_DATE},{END_DATE}".encode()).hexdigest()
+cache_path = os.path.join(CACHE_DIR, f"{cache_key}.json")
+
+data = None
+if not args.force_refresh:
+    try:
+        if time.time() - os.path.getmtime(cache_path) < CACHE_TTL:
+            with open(cache_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            print(f"💨 Using cached response: {cache_path}")
+    except (OSError, ValueError):
+        data = None
+
+if data is None:
+    print(f"   Downloading {len(CHUNKS)} yearly chunks ({FETCH_WORKERS} at a time)...")
+    try:
+        with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as executor:
+            parts = list(executor.map(fetch_chunk, CHUNKS))  # 保持年份顺序
+    except Exception as e:
+        print(f"❌ Error fetching data: {e}")
+        sys.exit(1)
+
+    errors = [part for part in parts if part.get("error")]
+    if errors:
+        data = errors[0]
+    else:
+        # 按年份顺序把各段的每一列拼起来
+        daily_keys = parts[0]["daily"].keys()
+        data = {**parts[0], "daily": {
+            key: [v for part in parts for v in part["daily"][key]] for key in daily_keys
+        }}
+
+    if not data.get("error"):
+        # 先写临时文件再原子替换；缓存只是优化，写不进去也继续导出
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            with open(cache_path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(cache_path + ".tmp", cache_path)
+        except OSError as e:
+            print(f"⚠️  Could not write cache: {e}")
 
 # 检查是否有错误
 if data.get("error"):
     print(f"❌ API Error: {data.get('reason', 'Unknown')}")
     sys.exit(1)
 
+# 每个字段转成一个连续的数组（None → NaN / <NA>），导出 CSV 和统计共用
 daily = data["daily"]
 dates = daily["time"]
-temp_max = daily["temperature_2m_max"]
-temp_min = daily["temperature_2m_min"]
-temp_mean = daily["temperature_2m_mean"]
-precip = daily["precipitation_sum"]
-weather_code = daily["weather_code"]
+temp_max = np.array(daily["temperature_2m_max"], dtype=np.float64)
+temp_min = np.array(daily["temperature_2m_min"], dtype=np.float64)
+temp_mean = np.array(daily["temperature_2m_mean"], dtype=np.float64)
+precip = np.array(daily["precipitation_sum"], dtype=np.float64)
+weather_code = pd.array(daily["weather_code"], dtype="Int16")  # 可空整数，缺失写成空
 
 # WMO Weather Code 映射（简化版）
 WMO_CODES = {
@@ -71,41 +163,41 @@ WMO_CODES = {
     85: "Slight snow showers", 86: "Heavy snow showers",
     95: "Thunderstorm", 96: "Thunderstorm w/ slight hail", 99: "Thunderstorm w/ heavy hail",
 }
+# WMO 代码范围是 0-99: 预先展开成 100 项查找表，按下标取描述（未收录的代码显示代码本身）
+WMO_TABLE = np.array([WMO_CODES.get(i, str(i)) for i in range(100)], dtype=object)
 
 # 保存 CSV
 OUTPUT = "charlottesville_weather_2025.csv"
-with open(OUTPUT, "w", newline="", encoding="utf-8") as f:
-    writer = csv.writer(f)
-    writer.writerow([
-        "date", "temp_max_F", "temp_min_F", "temp_mean_F",
-        "precipitation_inch", "weather_code", "weather_description"
-    ])
-    for i in range(len(dates)):
-        wc = weather_code[i] if weather_code[i] is not None else ""
-        desc = WMO_CODES.get(wc, str(wc)) if wc != "" else ""
-        writer.writerow([
-            dates[i],
-            temp_max[i],
-            temp_min[i],
-            temp_mean[i],
-            precip[i],
-            wc,
-            desc,
-        ])
+df = pd.DataFrame({
+    "date": dates,
+    "temp_max_F": temp_max,
+    "temp_min_F": temp_min,
+    "temp_mean_F": temp_mean,
+    "precipitation_inch": precip,
+    "weather_code": weather_code,
+})
+# 0-99 的代码直接查表；缺失的代码描述为空，超出范围的显示代码本身
+codes = df["weather_code"]
+in_table = ((codes >= 0) & (codes < 100)).fillna(False).to_numpy(dtype=bool)
+descriptions = codes.astype("string").fillna("").to_numpy(dtype=object)
+descriptions[in_table] = WMO_TABLE[codes.to_numpy(dtype=np.int64, na_value=0)[in_table]]
+df["weather_description"] = descriptions
+# 注: pyarrow.csv.write_csv 更快，但会把 0.0 写成 "0"、缺失浮点写成 "nan"、
+# 并给所有字符串加引号，导出格式会变；4000 行用 pandas 只要 ~10ms，保留 to_csv。
+df.to_csv(OUTPUT, index=False, encoding="utf-8")
 
 print(f"✅ Done! {len(dates)} days of data saved to: {OUTPUT}")
 print(f"\n📊 Quick Stats:")
 print(f"   Date range: {dates[0]} to {dates[-1]}")
 
-# 过滤掉 None 值计算统计
-valid_max = [t for t in temp_max if t is not None]
-valid_min = [t for t in temp_min if t is not None]
-valid_precip = [p for p in precip if p is not None]
-
-if valid_max:
-    print(f"   Hottest day:  {max(valid_max):.1f}°F on {dates[temp_max.index(max(valid_max))]}")
-if valid_min:
-    print(f"   Coldest day:  {min(valid_min):.1f}°F on {dates[temp_min.index(min(valid_min))]}")
-if valid_precip:
-    print(f"   Wettest day:  {max(valid_precip):.2f}\" on {dates[precip.index(max(valid_precip))]}")
-    print(f"   Total precip: {sum(valid_precip):.2f}\"")
\ No newline at end of file
+# 缺失值是 NaN，用 NumPy 的 nan* 函数统计（每个字段一次向量化扫描）
+if not np.isnan(temp_max).all():
+    i = int(np.nanargmax(temp_max))
+    print(f"   Hottest day:  {temp_max[i]:.1f}°F on {dates[i]}")
+if not np.isnan(temp_min).all():
+    i = int(np.nanargmin(temp_min))
+    print(f"   Coldest day:  {temp_min[i]:.1f}°F on {dates[i]}")
+if not np.isnan(precip).all():
+    i = int(np.nanargmax(precip))
+    print(f"   Wettest day:  {precip[i]:.2f}\" on {dates[i]}")
+    print(f"   Total precip: {np.nansum(precip):.2f}\"")